@@ -17,12 +17,40 @@ import zipfile
 import tarfile
 import tempfile
 import re
+import shutil
+import subprocess
+import argparse
+import contextlib
+import json
+import threading
+import functools
+import uuid
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from queue import Queue, Empty, Full
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Add the current directory to the path so we can import seafileapi
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from seafileapi import SeafileAPI
 
+# 可选依赖：python-isal 提供基于 ISA-L 的 SIMD 加速 inflate，未安装时使用标准库 zlib/gzip
+try:
+    from isal import igzip, isal_zlib
+except ImportError:
+    igzip = isal_zlib = None
+
+# 可选依赖：rapidgzip 可多线程并行解压单个 gzip/bzip2 文件
+try:
+    import rapidgzip
+except ImportError:
+    rapidgzip = None
+
 # Configuration - Modify these values according to your setup
 SERVER_URL = ""  # Replace with your Seafile server URL
 LOGIN_NAME = ""  # Replace with your login name
@@ -31,34 +59,604 @@ PASSWORD = ""  # Replace with your password
 # Supported archive file extensions
 ARCHIVE_EXTENSIONS = {'.zip', '.tar', '.tar.gz', '.tar.bz2', '.tgz', '.tbz2'}
 
+# 匹配上述扩展名的预编译正则，长扩展名优先（.tar.gz 先于 .tar）
+_ARCHIVE_RE = re.compile(
+    '(?:%s)$' % '|'.join(re.escape(ext) for ext in sorted(ARCHIVE_EXTENSIONS, key=len, reverse=True)),
+    re.IGNORECASE)
+
+# 超过该大小的 .tar.gz/.tar.bz2 下载到本地后用 rapidgzip 多线程解压（需已安装 rapidgzip）
+PARALLEL_DECOMPRESS_THRESHOLD = 128 * 1024 * 1024
+
+# 解压时每次复制的块大小（tarfile 默认 16 KiB），同时作为流式 tar 的读取缓冲区大小
+EXTRACT_COPY_BUFSIZE = 1024 * 1024
+
+# zipfile 解压成员时调用 shutil.copyfileobj 的默认块大小，放大到与 tar 一致
+shutil.COPY_BUFSIZE = EXTRACT_COPY_BUFSIZE
+
+# 系统 tar 可执行文件；超过上述大小的 tar 流交给它解包，逐个 512 字节头部的解析在 C 中完成
+SYSTEM_TAR = shutil.which('tar')
+
+# 同时处理的压缩包数量（下载/解压/上传均为网络 I/O 密集型）。
+# 整个进程共用的 Range 下载线程数等于该值，上传线程数为其 UPLOAD_WORKERS_PER_ARCHIVE 倍，
+# 因此同时发往服务器的请求数随 --concurrency 线性变化
+DEFAULT_CONCURRENCY = 8
+
+# 大文件分段并发下载：每段大小，以及单独调用 download_file_parallel 时的并发连接数
+DOWNLOAD_CHUNK_SIZE = 16 * 1024 * 1024
+DOWNLOAD_WORKERS = 8
+
+# 不超过该大小的 zip 在内存中缓冲后直接解压，不落盘
+STREAM_SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+# 解压内容上传：每个并发压缩包对应的上传线程数，以及单次 multipart 请求最多合并的文件数与字节数
+UPLOAD_WORKERS_PER_ARCHIVE = 2
+UPLOAD_BATCH_FILES = 50
+UPLOAD_BATCH_BYTES = 64 * 1024 * 1024
+
+# 上传进度文件，记录中断时已上传的解压内容，下次运行时据此续传
+STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.upload_state.jsonl')
+# 进度文件每追加多少条记录 fsync 一次
+STATE_SYNC_EVERY = 50
+
+# rapidgzip 自身会用满所有核心，同一时间只解压一个这样的压缩包
+_parallel_decompress_lock = threading.Lock()
+
+# 保护各目录已有名称集合的并发检查与登记
+_existing_names_lock = threading.Lock()
+
+# 保证多个线程输出的日志整行写出、互不交错
+_log_lock = threading.Lock()
+
+def log(message=''):
+    """输出一行进度日志。整行一次写入并立即刷新，可在多个线程中同时调用。"""
+    with _log_lock:
+        sys.stdout.write(message + '\n')
+        sys.stdout.flush()
+
+def http_pool_size(concurrency):
+    """
+    Number of connections needed when every thread that talks to Seafile is busy:
+    the download- and upload-stage workers, the shared range-download and upload
+    pools, and the directory walker.
+    """
+    return concurrency * (3 + UPLOAD_WORKERS_PER_ARCHIVE) + 1
+
+def set_http_pool_size(session, pool_size):
+    """Mount an adapter with pool_size keep-alive connections per host and retries."""
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=Retry(total=3, backoff_factor=0.2))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+def _create_session():
+    """Create the shared HTTP session with a connection pool and retries."""
+    session = requests.Session()
+    set_http_pool_size(session, http_pool_size(DEFAULT_CONCURRENCY))
+    return session
+
+_session = _create_session()
+
+# seafileapi 的 Repo/SeafileAPI 直接调用 requests.get/post/delete，每次都新建连接。
+# Session 提供同名同参数的方法，替换其模块中的 requests 引用即可让所有调用复用连接池。
+_seafileapi_main = sys.modules.get('seafileapi.main')
+if _seafileapi_main is not None and getattr(_seafileapi_main, 'requests', None) is requests:
+    _seafileapi_main.requests = _session
+
+def configure_session(seafile_api):
+    """Set the authorization header of the authenticated account on the shared session."""
+    _session.headers['Authorization'] = seafile_api.headers['Authorization']
+
+def get_archive_extension(filename):
+    """Return the lower-cased archive extension of filename, or None if it is not an archive."""
+    match = _ARCHIVE_RE.search(filename)
+    return match.group(0).lower() if match else None
+
 def is_archive_file(filename):
     """Check if a file is an archive based on its extension."""
-    for ext in ARCHIVE_EXTENSIONS:
-        if filename.lower().endswith(ext):
-            return True
-    return False
+    return _ARCHIVE_RE.search(filename) is not None
 
 def get_archive_folder_name(filename):
     """Get the folder name for an extracted archive."""
-    for ext in sorted(ARCHIVE_EXTENSIONS, key=len, reverse=True):
-        if filename.lower().endswith(ext):
-            return filename[:-len(ext)]
-    return filename + "_extracted"
+    match = _ARCHIVE_RE.search(filename)
+    return filename[:match.start()] if match else filename + "_extracted"
+
+if isal_zlib is not None:
+    _stdlib_get_decompressor = zipfile._get_decompressor
+
+    def _get_decompressor(compress_type):
+        """Use ISA-L raw inflate for deflated zip members."""
+        if compress_type == zipfile.ZIP_DEFLATED:
+            return isal_zlib.decompressobj(-15)
+        return _stdlib_get_decompressor(compress_type)
+
+    zipfile._get_decompressor = _get_decompressor
 
-def extract_archive(file_path, extract_to):
-    """Extract an archive file to the specified directory."""
+def use_parallel_decompression(file_path, size):
+    """Whether a tar archive of the given size should be decompressed with rapidgzip."""
+    return (rapidgzip is not None and size is not None and size > PARALLEL_DECOMPRESS_THRESHOLD
+            and get_archive_extension(file_path) in ('.tar.gz', '.tgz', '.tar.bz2', '.tbz2'))
+
+def use_system_tar(file_path, size):
+    """Whether an uncompressed tar archive of the given size should be unpacked by SYSTEM_TAR."""
+    return (SYSTEM_TAR is not None and size is not None and size > PARALLEL_DECOMPRESS_THRESHOLD
+            and get_archive_extension(file_path) == '.tar')
+
+def _extract_with_system_tar(extract_to, file_path=None, fileobj=None):
+    """
+    Unpack an uncompressed tar with the system tar binary.
+
+    The archive is read from file_path, or piped to tar's stdin from fileobj
+    (e.g. a rapidgzip reader or an HTTP response). Raises RuntimeError if
+    tar exits with an error.
+    """
+    cmd = [SYSTEM_TAR, '-x', '--no-same-owner', '-f', file_path or '-', '-C', extract_to]
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if fileobj is not None else subprocess.DEVNULL,
+                                stdout=subprocess.DEVNULL, stderr=stderr)
+        if fileobj is not None:
+            try:
+                shutil.copyfileobj(fileobj, proc.stdin, 1024 * 1024)
+            except BrokenPipeError:
+                # tar 提前退出，错误信息见下方的返回码和 stderr
+                pass
+            finally:
+                with contextlib.suppress(BrokenPipeError):
+                    proc.stdin.close()
+        if proc.wait() != 0:
+            stderr.seek(0)
+            message = stderr.read().decode(errors='replace').strip()
+            raise RuntimeError(f"tar exited with code {proc.returncode}: {message}")
+
+def _extract_zip(file_path, extract_to, fileobj):
+    with zipfile.ZipFile(fileobj or file_path, 'r') as zip_ref:
+        zip_ref.extractall(extract_to)
+
+def _extract_tar(file_path, extract_to, fileobj):
+    if fileobj is not None:
+        tar_ref = tarfile.open(fileobj=fileobj, mode='r|*', bufsize=EXTRACT_COPY_BUFSIZE,
+                               copybufsize=EXTRACT_COPY_BUFSIZE)
+    elif use_system_tar(file_path, os.path.getsize(file_path)):
+        _extract_with_system_tar(extract_to, file_path=file_path)
+        return
+    else:
+        tar_ref = tarfile.open(file_path, 'r:*', copybufsize=EXTRACT_COPY_BUFSIZE)
+    with tar_ref:
+        tar_ref.extractall(extract_to)
+
+def _extract_decompressed_tar(reader, extract_to, use_tar_binary=False):
+    with reader:
+        if use_tar_binary and SYSTEM_TAR is not None:
+            _extract_with_system_tar(extract_to, fileobj=reader)
+            return
+        with tarfile.open(fileobj=reader, mode='r|', bufsize=EXTRACT_COPY_BUFSIZE,
+                          copybufsize=EXTRACT_COPY_BUFSIZE) as tar_ref:
+            tar_ref.extractall(extract_to)
+
+def _extract_tar_gz(file_path, extract_to, fileobj):
+    if fileobj is None and use_parallel_decompression(file_path, os.path.getsize(file_path)):
+        _extract_decompressed_tar(rapidgzip.RapidgzipFile(file_path, parallelization=os.cpu_count()),
+                                 extract_to, use_tar_binary=True)
+    elif igzip is not None:
+        gz = igzip.GzipFile(filename=None if fileobj else file_path, mode='rb', fileobj=fileobj)
+        _extract_decompressed_tar(gz, extract_to)
+    else:
+        _extract_tar(file_path, extract_to, fileobj)
+
+def _extract_tar_bz2(file_path, extract_to, fileobj):
+    if fileobj is None and use_parallel_decompression(file_path, os.path.getsize(file_path)):
+        _extract_decompressed_tar(rapidgzip.IndexedBzip2File(file_path, parallelization=os.cpu_count()),
+                                 extract_to, use_tar_binary=True)
+    else:
+        _extract_tar(file_path, extract_to, fileobj)
+
+# 按扩展名分派的解压函数，键与 ARCHIVE_EXTENSIONS 一致
+_EXTRACTORS = {
+    '.zip': _extract_zip,
+    '.tar': _extract_tar,
+    '.tar.gz': _extract_tar_gz,
+    '.tgz': _extract_tar_gz,
+    '.tar.bz2': _extract_tar_bz2,
+    '.tbz2': _extract_tar_bz2,
+}
+
+def extract_archive(file_path, extract_to, fileobj=None):
+    """
+    Extract an archive file to the specified directory.
+
+    If fileobj is given it is read instead of file_path, which is then only
+    used to detect the archive type. Tar archives are read in streaming mode
+    and need no seeking; zip archives need a seekable fileobj.
+    """
+    extractor = _EXTRACTORS.get(get_archive_extension(file_path))
     try:
-        if file_path.endswith('.zip'):
-            with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_to)
-        elif file_path.endswith(('.tar', '.tar.gz', '.tar.bz2', '.tgz', '.tbz2')):
-            with tarfile.open(file_path, 'r:*') as tar_ref:
-                tar_ref.extractall(extract_to)
+        if extractor is not None:
+            extractor(file_path, extract_to, fileobj)
         return True
     except Exception as e:
-        print(f"Error extracting {file_path}: {e}")
+        log(f"Error extracting {file_path}: {e}")
         return False
 
+class CountingReader(object):
+    """File-like wrapper that counts the bytes read from fileobj."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self.size += len(data)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def drain(self):
+        """Read whatever the consumer left unread."""
+        while self.read(1024 * 1024):
+            pass
+
+def check_download_size(file_path, received, size):
+    """报告下载字节数与 Seafile 列出的文件大小不一致的情况，一致或大小未知时返回 True。"""
+    if size is None or received == size:
+        return True
+    log(f"    下载 {file_path} 不完整：收到 {received} 字节，应为 {size} 字节")
+    return False
+
+class RangeNotSupported(Exception):
+    """Raised when the file server ignores an HTTP Range request."""
+
+@functools.lru_cache(maxsize=None)
+def get_repo(seafile_api, repo_id):
+    """
+    Return a Repo handle for repo_id, cached per SeafileAPI instance.
+
+    SeafileAPI.get_repo fetches the repo metadata and the server version on
+    every call; the interactive selector and the recursive processing both
+    need the same handle.
+    """
+    return seafile_api.get_repo(repo_id)
+
+@functools.lru_cache(maxsize=None)
+def get_repo_details(repo):
+    """Return the details of a Repo handle, fetched once per handle."""
+    return repo.get_repo_details()
+
+def get_download_link(repo, file_path, reuse=False):
+    """
+    Ask Seafile for a download URL of a file in the repo.
+
+    The URL is a one-time token that the first request consumes, unless
+    reuse is set so that it can serve several requests (HEAD + ranges).
+    """
+    url = repo._repo_download_link_url()
+    params = {'path': file_path} if '/via-repo-token' in url else {'p': file_path}
+    if reuse:
+        params['reuse'] = 1
+    response = _session.get(url, params=params, timeout=repo.timeout)
+    response.raise_for_status()
+    return response.json()
+
+def _download_range(download_url, save_path, start, end, timeout):
+    """Download bytes [start, end] of download_url into the same offsets of save_path."""
+    range_headers = {'Range': f'bytes={start}-{end}'}
+    with _session.get(download_url, headers=range_headers, stream=True, timeout=timeout) as response:
+        # 200 表示服务器忽略了 Range，返回了整个文件；其他错误状态直接抛出
+        if response.status_code == 200:
+            raise RangeNotSupported("server ignored the Range header")
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise IOError(f"range {start}-{end}: unexpected HTTP {response.status_code}")
+        written = 0
+        with open(save_path, 'r+b') as f:
+            f.seek(start)
+            for chunk in response.iter_content(chunk_size=1024 * 1024):
+                f.write(chunk)
+                written += len(chunk)
+    if written != end - start + 1:
+        raise IOError(f"range {start}-{end} truncated: got {written} bytes")
+
+def _preallocate(save_path, size):
+    """Create save_path with its final size so that workers can write at any offset."""
+    with open(save_path, 'wb') as f:
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+        except (AttributeError, OSError):
+            f.truncate(size)
+
+def download_file_parallel(repo, file_path, save_path, size=None, chunk_size=DOWNLOAD_CHUNK_SIZE,
+                           executor=None, max_workers=DOWNLOAD_WORKERS):
+    """
+    Download a file using several concurrent HTTP Range requests.
+
+    The ranges run on executor, which may be shared with other downloads;
+    without one a pool of max_workers threads is created for this file.
+    Files smaller than two chunks, and servers that answer Range requests
+    with the whole file (200), fall back to a single-stream download_file.
+    Any other failed range aborts the download: ranges not yet started are
+    cancelled and the error is raised.
+    """
+    if size is not None and size < 2 * chunk_size:
+        download_file(repo, file_path, save_path)
+        return
+
+    try:
+        download_url = get_download_link(repo, file_path, reuse=True)
+        head = _session.head(download_url, allow_redirects=True, timeout=repo.timeout)
+        total = int(head.headers.get('Content-Length', 0)) if head.status_code == 200 else 0
+        if total < 2 * chunk_size:
+            raise RangeNotSupported("file too small or size unknown")
+
+        _preallocate(save_path, total)
+        ranges = [(start, min(start + chunk_size, total) - 1) for start in range(0, total, chunk_size)]
+        with contextlib.ExitStack() as stack:
+            if executor is None:
+                executor = stack.enter_context(ThreadPoolExecutor(max_workers=min(max_workers, len(ranges))))
+            futures = [executor.submit(_download_range, download_url, save_path,
+                                       start, end, repo.timeout)
+                       for start, end in ranges]
+
+            def cancel_pending(done):
+                # 任一分段失败时立即取消其余尚未开始的分段
+                if not done.cancelled() and done.exception() is not None:
+                    for future in futures:
+                        future.cancel()
+
+            for future in futures:
+                future.add_done_callback(cancel_pending)
+            # 只用 result() 等待：被 shutdown(cancel_futures=True) 取消的 future 不会唤醒
+            # as_completed()/wait()，result() 则会立即抛出 CancelledError
+            try:
+                for future in futures:
+                    future.result()
+            except BaseException:
+                # 取消尚未开始的分段，并等待正在写入 save_path 的分段结束
+                for future in futures:
+                    if not future.cancel():
+                        with contextlib.suppress(Exception):
+                            future.result()
+                raise
+    except RangeNotSupported:
+        download_file(repo, file_path, save_path)
+
+def open_download_stream(repo, file_path):
+    """Open a streaming HTTP response for a file in the repo."""
+    response = _session.get(get_download_link(repo, file_path), stream=True, timeout=repo.timeout)
+    response.raise_for_status()
+    response.raw.decode_content = True
+    return response
+
+def download_file(repo, file_path, save_path):
+    """
+    Download a file in a single stream, copying it to disk in 1 MiB blocks.
+
+    Unlike repo.download_file this never holds the whole file in memory.
+    """
+    with open_download_stream(repo, file_path) as response, open(save_path, 'wb') as f:
+        shutil.copyfileobj(response.raw, f, 1024 * 1024)
+
+def stream_extract_archive(repo, file_path, extract_to, size=None):
+    """
+    Extract an archive straight from the HTTP response without saving it first.
+
+    Tar archives are piped into tarfile's streaming mode. Zip archives need
+    random access, so only those up to STREAM_SPOOL_MAX_SIZE are buffered in
+    memory and extracted; larger ones return False so that the caller
+    downloads them to disk instead. Large gzip/bzip2 tars are also left to
+    the caller when they can be decompressed in parallel from disk.
+
+    The number of downloaded bytes is checked against size. Returns True on success.
+    """
+    is_zip = get_archive_extension(file_path) == '.zip'
+    if is_zip and (size is None or size > STREAM_SPOOL_MAX_SIZE):
+        return False
+    if use_parallel_decompression(file_path, size):
+        return False
+
+    try:
+        with open_download_stream(repo, file_path) as response:
+            reader = CountingReader(response.raw)
+            if not is_zip:
+                if use_system_tar(file_path, size):
+                    _extract_with_system_tar(extract_to, fileobj=reader)
+                elif not extract_archive(file_path, extract_to, reader):
+                    return False
+                # tarfile 读到归档结束标记即停止，其后的填充数据也要计入下载字节数
+                reader.drain()
+                return check_download_size(file_path, reader.size, size)
+            with tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_MAX_SIZE,
+                                               dir=os.path.dirname(extract_to)) as spool:
+                shutil.copyfileobj(reader, spool, 1024 * 1024)
+                if not check_download_size(file_path, reader.size, size):
+                    return False
+                spool.seek(0)
+                return extract_archive(file_path, extract_to, spool)
+    except Exception as e:
+        log(f"    流式解压 {file_path} 失败: {e}")
+        return False
+
+def get_upload_link(repo, parent_dir):
+    """Ask Seafile for an upload URL for parent_dir."""
+    url = repo._repo_upload_link_url()
+    params = {'path': parent_dir} if '/via-repo-token' in url else {'p': parent_dir}
+    response = _session.get(url, params=params, timeout=repo.timeout)
+    response.raise_for_status()
+    return response.text.strip('"')
+
+class MultipartBody(object):
+    """
+    A multipart/form-data request body that reads the files while it is sent.
+
+    requests builds a files= body fully in memory. This object has a
+    length and a read method instead, so requests sends it with a
+    Content-Length header, a block at a time.
+    """
+
+    def __init__(self, fields, files):
+        """fields is a list of (name, value), files a list of (name, local_path)."""
+        boundary = uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=' + boundary
+        parts = []
+        for name, value in fields:
+            parts.append(('--%s\r\nContent-Disposition: form-data; name="%s"\r\n\r\n%s\r\n'
+                          % (boundary, name, value)).encode('utf-8'))
+        for name, path in files:
+            filename = os.path.basename(path)
+            for char, escaped in (('"', '%22'), ('\r', '%0D'), ('\n', '%0A')):
+                filename = filename.replace(char, escaped)
+            parts.append(('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n'
+                          'Content-Type: application/octet-stream\r\n\r\n'
+                          % (boundary, name, filename)).encode('utf-8'))
+            parts.append(path)
+            parts.append(b'\r\n')
+        parts.append(('--%s--\r\n' % boundary).encode('ascii'))
+        self._length = sum(len(part) if isinstance(part, bytes) else os.path.getsize(part)
+                           for part in parts)
+        self._parts = deque(parts)
+        self._file = None
+
+    def __len__(self):
+        return self._length
+
+    def read(self, size=-1):
+        while True:
+            if self._file is not None:
+                data = self._file.read(size)
+                if data:
+                    return data
+                self.close()
+            if not self._parts:
+                return b''
+            part = self._parts.popleft()
+            if isinstance(part, bytes):
+                return part
+            self._file = open(part, 'rb')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+def upload_files(repo, parent_dir, file_paths):
+    """
+    Upload several local files into parent_dir with a single multipart POST.
+
+    The body is streamed from disk, so memory use does not grow with the batch size.
+    """
+    upload_link = "%s?ret-json=1" % get_upload_link(repo, parent_dir)
+    # replace=1：续传时重复上传的文件直接覆盖，而不是另存为 "name (1)"
+    body = MultipartBody([('parent_dir', parent_dir), ('replace', '1')],
+                         [('file', path) for path in file_paths])
+    try:
+        response = _session.post(upload_link, data=body, headers={'Content-Type': body.content_type},
+                                 timeout=repo.timeout)
+    finally:
+        body.close()
+    response.raise_for_status()
+    return response.json()
+
+def _create_dir(repo, dir_path, on_created=None):
+    """创建一个 Seafile 目录并报告结果，成功后立即以 dir_path 调用 on_created。"""
+    try:
+        repo.create_dir(dir_path)
+        log(f"      创建目录: {dir_path}")
+    except Exception as e:
+        log(f"      创建目录 {dir_path} 失败: {e}")
+        return False
+    if on_created is not None:
+        on_created(dir_path)
+    return True
+
+def create_dirs(repo, dir_paths, executor, on_created=None):
+    """
+    并发创建一组 Seafile 目录。目录按深度分层，同一层内并发创建，
+    上一层全部完成后再创建下一层，保证父目录总是先于子目录存在。
+    每个目录创建成功后立即以其路径调用 on_created。全部创建成功时返回 True。
+    """
+    levels = {}
+    for dir_path in dir_paths:
+        levels.setdefault(dir_path.count('/'), []).append(dir_path)
+    ok = True
+    for depth in sorted(levels):
+        results = list(executor.map(functools.partial(_create_dir, repo, on_created=on_created),
+                                    levels[depth]))
+        ok = all(results) and ok
+    return ok
+
+def find_existing_dirs(repo, dir_paths, executor):
+    """
+    返回 dir_paths 中在 Seafile 上已存在的目录。每个父目录只列出一次；
+    无法列出的父目录（通常是尚未创建）视为其中没有子目录。
+    """
+    by_parent = {}
+    for dir_path in dir_paths:
+        parent, _, name = dir_path.rpartition('/')
+        by_parent.setdefault(parent, []).append(name)
+
+    def list_subdirs(parent):
+        try:
+            return {item['name'] for item in repo.list_dir(parent) if item['type'] == 'dir'}
+        except Exception:
+            return set()
+
+    existing = set()
+    for parent, subdirs in zip(by_parent, executor.map(list_subdirs, by_parent)):
+        existing.update(parent + '/' + name for name in by_parent[parent] if name in subdirs)
+    return existing
+
+def batch_upload_tasks(upload_tasks):
+    """
+    Group (seafile_dir, local_file_path) tasks by target directory and split
+    each group into batches bounded by UPLOAD_BATCH_FILES and UPLOAD_BATCH_BYTES.
+    """
+    by_dir = {}
+    for upload_seafile_dir, local_file_path in upload_tasks:
+        by_dir.setdefault(upload_seafile_dir, []).append(local_file_path)
+
+    batches = []
+    for upload_seafile_dir, paths in by_dir.items():
+        batch, batch_bytes = [], 0
+        for path in paths:
+            size = os.path.getsize(path)
+            if batch and (len(batch) >= UPLOAD_BATCH_FILES or batch_bytes + size > UPLOAD_BATCH_BYTES):
+                batches.append((upload_seafile_dir, batch))
+                batch, batch_bytes = [], 0
+            batch.append(path)
+            batch_bytes += size
+        if batch:
+            batches.append((upload_seafile_dir, batch))
+    return batches
+
+def upload_batch(repo, upload_seafile_dir, file_paths):
+    """
+    上传一批文件。合并请求失败时逐个重试，以便准确报告失败的文件。
+    返回上传成功的本地文件路径列表。
+    """
+    try:
+        upload_files(repo, upload_seafile_dir, file_paths)
+    except Exception as e:
+        if len(file_paths) == 1:
+            log(f"      上传 {upload_seafile_dir}/{os.path.basename(file_paths[0])} 失败: {e}")
+            return []
+        log(f"      批量上传到 {upload_seafile_dir} 失败，改为逐个上传: {e}")
+        uploaded = []
+        for local_file_path in file_paths:
+            uploaded_path = upload_seafile_dir + '/' + os.path.basename(local_file_path)
+            try:
+                # 仍用 replace=1 上传：合并请求可能已在服务器端保存了部分文件
+                upload_files(repo, upload_seafile_dir, [local_file_path])
+                log(f"      上传文件: {uploaded_path}")
+                uploaded.append(local_file_path)
+            except Exception as e:
+                log(f"      上传 {uploaded_path} 失败: {e}")
+        return uploaded
+
+    for local_file_path in file_paths:
+        log(f"      上传文件: {upload_seafile_dir}/{os.path.basename(local_file_path)}")
+    return file_paths
+
 # ----------------- 新增/修改的代码 -----------------
 
 def interactive_select_path(seafile_api):
@@ -87,7 +685,7 @@ def interactive_select_path(seafile_api):
                 
                 if user_input in repos_map:
                     selected_repo_info = repos_map[user_input]
-                    current_repo = seafile_api.get_repo(selected_repo_info['id'])
+                    current_repo = get_repo(seafile_api, selected_repo_info['id'])
                     current_repo_name = selected_repo_info['name']
                     current_path = '/'
                     print(f"已选择仓库：{current_repo_name}")
@@ -158,140 +756,533 @@ def interactive_select_path(seafile_api):
             current_repo_name = None
             current_path = '/'
             
-def handle_archive_file(repo, seafile_dir, archive_item, temp_dir):
+class UploadState(object):
     """
-    处理单个压缩文件：下载、解压、上传
+    保存在本地的上传进度，用于中断后的续传。
+
+    以 "仓库 id:压缩文件路径" 为键，记录解压目录中已创建的子目录和已上传的文件
+    （路径均相对于解压目录），并保存压缩文件的 Seafile 文件 id，文件内容变化后
+    之前的记录即作废。压缩文件处理完成后删除该记录。
+
+    进度文件是只追加的 JSON Lines 日志，每次更新追加一行，每 STATE_SYNC_EVERY
+    行 fsync 一次；启动时重放日志并重写为只含未完成记录的精简版本。
+    进度文件无法写入时给出警告，继续运行但不支持续传。
     """
-    archive_name = archive_item['name']
-    archive_full_path = os.path.join(seafile_dir, archive_name).replace('\\', '/')
 
-    folder_name = get_archive_folder_name(archive_name)
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._file = None
+        self._unsynced = 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        self._apply(json.loads(line))
+                    except (ValueError, TypeError, KeyError, AttributeError):
+                        # 中断时最后一行可能只写了一半
+                        pass
+        except OSError:
+            pass
+
+        try:
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for key, entry in self._entries.items():
+                    f.write(json.dumps(dict(entry, op='begin', key=key), ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            self._file = open(path, 'a', encoding='utf-8')
+        except OSError as e:
+            log(f"警告：无法写入上传进度文件 {path}，本次运行不支持续传: {e}")
+
+    def _apply(self, op):
+        key = op['key']
+        if op['op'] == 'begin':
+            self._entries[key] = {'archive': op.get('archive'), 'file_id': op.get('file_id'),
+                                  'dirs': list(op.get('dirs', ())), 'files': list(op.get('files', ()))}
+        elif op['op'] == 'record':
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry['dirs'].extend(op['dirs'])
+                entry['files'].extend(op['files'])
+        elif op['op'] == 'discard':
+            self._entries.pop(key, None)
 
-    # 检查解压文件夹是否已存在
-    try:
-        items_in_seafile_dir = repo.list_dir(seafile_dir)
-        existing_items = {item['name'] for item in items_in_seafile_dir}
-        if folder_name in existing_items:
-            print(f"  跳过 {archive_name}，因为解压目录 {folder_name} 已存在。")
+    def _append(self, op):
+        """Apply op and append it to the log. Must be called with the lock held."""
+        self._apply(op)
+        if self._file is None:
             return
-    except Exception as e:
-        print(f"  警告：无法检查目录存在性，继续处理。错误: {e}")
+        try:
+            self._file.write(json.dumps(op, ensure_ascii=False) + '\n')
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= STATE_SYNC_EVERY:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+        except OSError as e:
+            log(f"警告：写入上传进度文件 {self.path} 失败，之后不再记录上传进度: {e}")
+            with contextlib.suppress(OSError):
+                self._file.close()
+            self._file = None
+
+    def has(self, key, file_id):
+        """Whether there is a record for key made from the archive with file_id."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry['file_id'] == file_id
+
+    def begin(self, key, archive_path, file_id):
+        """
+        Return the (dirs, files) already recorded for key, creating the entry if needed.
+
+        An entry recorded for a different file_id is replaced by an empty one.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['file_id'] != file_id:
+                self._append({'op': 'begin', 'key': key, 'archive': archive_path, 'file_id': file_id})
+            entry = self._entries[key]
+            return set(entry['dirs']), set(entry['files'])
+
+    def record(self, key, dirs=(), files=()):
+        """Record created dirs and uploaded files for key."""
+        with self._lock:
+            if key in self._entries:
+                self._append({'op': 'record', 'key': key, 'dirs': list(dirs), 'files': list(files)})
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._append({'op': 'discard', 'key': key})
 
-    print(f"  正在处理 {archive_full_path}...")
+    def close(self):
+        """Sync and close the log file."""
+        with self._lock:
+            if self._file is not None:
+                with contextlib.suppress(OSError):
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                    self._file.close()
+                self._file = None
+
+def get_done_marker_name(archive_name):
+    """解压内容全部上传成功后，写入解压目录的完成标记文件名。"""
+    return '.%s.done' % archive_name
+
+def has_done_marker(repo, target_seafile_dir, archive_name):
+    """通过单次文件信息请求检查完成标记是否存在，无需列出整个目录。"""
+    try:
+        repo.get_file(target_seafile_dir + '/' + get_done_marker_name(archive_name))
+        return True
+    except Exception:
+        return False
+
+class ArchiveJob(object):
+    """
+    一个待处理的压缩文件，以及在下载、解压、上传各阶段之间传递的状态。
+    """
+
+    def __init__(self, repo, seafile_dir, archive_item, temp_dir, existing_names, upload_state=None):
+        self.repo = repo
+        self.seafile_dir = seafile_dir
+        self.archive_item = archive_item
+        self.archive_name = archive_item['name']
+        self.archive_full_path = os.path.join(seafile_dir, self.archive_name).replace('\\', '/')
+        self.folder_name = get_archive_folder_name(self.archive_name)
+        self.target_seafile_dir = os.path.join(seafile_dir, self.folder_name).replace('\\', '/')
+        self.temp_dir = temp_dir
+        # seafile_dir 中已有条目名称的集合，由调用方根据已获取的目录列表传入
+        self.existing_names = existing_names
+        # 进度记录按仓库和路径区分，文件 id 用于识别内容变化；没有 id 的条目不记录上传进度
+        self.file_id = archive_item.get('id')
+        self.upload_state = upload_state if self.file_id else None
+        self.state_key = '%s:%s' % (repo.repo_id, self.archive_full_path)
+
+        self.job_dir = None
+        self.extract_dir = None
+        # 已下载到本地、等待解压的压缩文件路径；边下载边解压时保持为 None
+        self.archive_local_path = None
+        # 解压目录已存在且有续传记录，本次继续上传上次未完成的内容
+        self.resuming = False
+
+def fetch_archive(job, range_executor=None):
+    """
+    下载阶段：检查解压目录是否已存在，然后边下载边解压，
+    或在不支持流式解压时将压缩文件下载到本地。成功时返回 True。
+
+    分段下载的请求提交到 range_executor（各任务共用的线程池）。
+    """
+    repo = job.repo
+    archive_name = job.archive_name
+    folder_name = job.folder_name
+
+    existing_names = job.existing_names
+
+    # 检查解压文件夹是否已存在，并登记该名称，
+    # 防止同目录下同名的压缩包（如 a.zip 与 a.tar.gz）并发解压到同一目录
+    with _existing_names_lock:
+        folder_exists = folder_name in existing_names
+        existing_names.add(folder_name)
+    upload_state = job.upload_state
+    if folder_exists:
+        # 只有存在续传记录时才需要完成标记来区分"已完成"与"中断"，其余情况直接跳过，不发请求
+        if upload_state is None or not upload_state.has(job.state_key, job.file_id):
+            log(f"  跳过 {archive_name}，因为解压目录 {folder_name} 已存在。")
+            return False
+        if has_done_marker(repo, job.target_seafile_dir, archive_name):
+            # 上次写入完成标记后、删除进度记录前中断
+            upload_state.discard(job.state_key)
+            log(f"  跳过 {archive_name}，解压内容已上传完成。")
+            return False
+        job.resuming = True
+        log(f"  继续处理 {job.archive_full_path}，跳过上次已上传的内容...")
+    else:
+        if upload_state is not None:
+            # 解压目录已不存在，之前的进度记录作废
+            upload_state.discard(job.state_key)
+        log(f"  正在处理 {job.archive_full_path}...")
+
+    # 每个任务使用独立的临时子目录，避免不同目录下的同名压缩包相互覆盖
+    job.job_dir = tempfile.mkdtemp(dir=job.temp_dir)
+    job.extract_dir = os.path.join(job.job_dir, folder_name)
+    os.makedirs(job.extract_dir)
+
+    # 优先边下载边解压；不支持或失败时再下载到本地，留给解压阶段处理
+    size = job.archive_item.get('size')
+    if stream_extract_archive(repo, job.archive_full_path, job.extract_dir, size):
+        log(f"    已解压至 {job.extract_dir}")
+        return True
+
+    shutil.rmtree(job.extract_dir, ignore_errors=True)
+    os.makedirs(job.extract_dir)
 
     # 下载压缩文件
-    archive_local_path = os.path.join(temp_dir, archive_name)
+    archive_local_path = os.path.join(job.job_dir, archive_name)
     try:
-        repo.download_file(archive_full_path, archive_local_path)
-        print(f"    已下载 {archive_name}")
+        download_file_parallel(repo, job.archive_full_path, archive_local_path, size,
+                               executor=range_executor)
     except Exception as e:
-        print(f"    下载 {archive_full_path} 失败: {e}")
-        return
+        log(f"    下载 {job.archive_full_path} 失败: {e}")
+        return False
+    if not check_download_size(job.archive_full_path, os.path.getsize(archive_local_path), size):
+        return False
+    log(f"    已下载 {archive_name}")
+    job.archive_local_path = archive_local_path
+    return True
 
-    # 解压文件
-    extract_dir = os.path.join(temp_dir, folder_name)
-    os.makedirs(extract_dir, exist_ok=True)
+def extract_downloaded_archive(job, extract_pool=None):
+    """
+    解压阶段：解压下载阶段保存到本地的压缩文件，随后删除该文件。
+    已边下载边解压的任务直接通过。成功时返回 True。
 
-    if extract_archive(archive_local_path, extract_dir):
-        print(f"    已解压至 {extract_dir}")
+    传入 extract_pool（ProcessPoolExecutor）时在子进程中解压，
+    使多个压缩文件的解压不受 GIL 限制、真正并行。由 rapidgzip 多线程
+    解压的大文件除外，它们在当前线程中一次一个地解压。
+    """
+    if job.archive_local_path is None:
+        return True
 
-        # 上传解压后的内容
-        try:
-            # 目标上传目录是原始文件所在的目录加上解压文件夹名
-            target_seafile_dir = os.path.join(seafile_dir, folder_name).replace('\\', '/')
-            # 修复：在创建目录时，如果失败则直接返回，防止后续上传失败
+    parallel = use_parallel_decompression(job.archive_local_path, os.path.getsize(job.archive_local_path))
+    if extract_pool is not None and not parallel:
+        extracted = extract_pool.submit(extract_archive, job.archive_local_path, job.extract_dir).result()
+    else:
+        # 交给 rapidgzip 的压缩包不进入进程池（否则最多会有 核数×核数 个解压线程），
+        # 而是在当前线程中逐个解压；rapidgzip 与系统 tar 都不受 GIL 限制
+        with _parallel_decompress_lock if parallel else contextlib.nullcontext():
+            extracted = extract_archive(job.archive_local_path, job.extract_dir)
+    os.remove(job.archive_local_path)
+    job.archive_local_path = None
+
+    if not extracted:
+        log(f"    解压 {job.archive_name} 失败")
+        return False
+    log(f"    已解压至 {job.extract_dir}")
+    return True
+
+def upload_extracted_contents(job, upload_executor):
+    """
+    上传阶段：在 Seafile 中创建解压目录结构并上传解压出的文件。成功时返回 True。
+    目录创建与文件上传的请求提交到 upload_executor（各任务共用的线程池）。
+
+    有上传进度记录时跳过其中已创建的目录和已上传的文件，并在每个目录、
+    每批文件完成后更新记录。续传时先检查未记录的目录是否已存在（上次可能在
+    创建后、记录前中断），避免 Seafile 因重名而另建 "name (1)" 目录。
+    """
+    repo = job.repo
+    archive_name = job.archive_name
+    extract_dir = job.extract_dir
+    upload_state = job.upload_state
+    state_key = job.state_key
+
+    # 上传解压后的内容
+    try:
+        # 目标上传目录是原始文件所在的目录加上解压文件夹名
+        target_seafile_dir = job.target_seafile_dir
+        target_prefix_len = len(target_seafile_dir) + 1
+
+        done_dirs, done_files = set(), set()
+        if upload_state is not None:
+            done_dirs, done_files = upload_state.begin(state_key, job.archive_full_path, job.file_id)
+
+        def upload_and_record(upload_seafile_dir, file_paths):
+            uploaded = upload_batch(repo, upload_seafile_dir, file_paths)
+            if upload_state is not None and uploaded:
+                upload_state.record(state_key, files=[
+                    path[prefix_len:].replace(os.sep, '/') for path in uploaded])
+            return len(uploaded) == len(file_paths)
+
+        def record_dirs(dir_paths):
+            if upload_state is not None:
+                upload_state.record(state_key, dirs=[path[target_prefix_len:] for path in dir_paths])
+
+        # 修复：在创建目录时，如果失败则直接返回，防止后续上传失败
+        # 目标目录用空的相对路径 '' 记录；续传时它必定已存在（下载阶段据此判断为续传）
+        if job.resuming and '' not in done_dirs:
+            upload_state.record(state_key, dirs=[''])
+        elif '' not in done_dirs:
             try:
                 repo.create_dir(target_seafile_dir)
-                print(f"    已创建 Seafile 目录 {target_seafile_dir}")
+                log(f"    已创建 Seafile 目录 {target_seafile_dir}")
             except Exception as e:
-                print(f"    创建 Seafile 目录 {target_seafile_dir} 失败: {e}")
-                print(f"    跳过 {archive_name} 的内容上传。")
-                return
+                log(f"    创建 Seafile 目录 {target_seafile_dir} 失败: {e}")
+                log(f"    跳过 {archive_name} 的内容上传。")
+                return False
+            if upload_state is not None:
+                upload_state.record(state_key, dirs=[''])
 
-            for root, dirs, files in os.walk(extract_dir):
-                rel_path = os.path.relpath(root, extract_dir)
-                
-                # --- 代码修改开始 ---
-                # 当 rel_path 为 '.', 代表是解压目录的根。
-                # 此时上传路径就是目标目录本身, 而不是在其后拼接 '/.'。
-                if rel_path == '.':
-                    upload_seafile_dir = target_seafile_dir
-                else:
-                    upload_seafile_dir = os.path.join(target_seafile_dir, rel_path).replace('\\', '/')
-                # --- 代码修改结束 ---
+        upload_tasks = []
+        seafile_dirs = []
+        # 相对路径直接从 root 截取前缀得到，避免逐个调用 relpath/join
+        prefix_len = len(extract_dir.rstrip(os.sep)) + 1
+        for root, dirs, files in os.walk(extract_dir):
+            # 解压目录的根对应目标目录本身, 而不是在其后拼接 '/.'
+            rel_path = root[prefix_len:].replace(os.sep, '/')
+            upload_seafile_dir = target_seafile_dir + '/' + rel_path if rel_path else target_seafile_dir
 
-                for dir_name in dirs:
-                    dir_path = os.path.join(upload_seafile_dir, dir_name).replace('\\', '/')
-                    try:
-                        repo.create_dir(dir_path)
-                        print(f"      创建目录: {dir_path}")
-                    except Exception as e:
-                        print(f"      创建目录 {dir_path} 失败: {e}")
+            rel_prefix = rel_path + '/' if rel_path else ''
+            for dir_name in dirs:
+                if rel_prefix + dir_name not in done_dirs:
+                    seafile_dirs.append(upload_seafile_dir + '/' + dir_name)
 
-                for file_name in files:
-                    local_file_path = os.path.join(root, file_name)
-                    try:
-                        repo.upload_file(upload_seafile_dir, local_file_path)
-                        uploaded_path = os.path.join(upload_seafile_dir, file_name).replace('\\', '/')
-                        print(f"      上传文件: {uploaded_path}")
-                    except Exception as e:
-                        error_path = os.path.join(upload_seafile_dir, file_name).replace('\\', '/')
-                        print(f"      上传 {error_path} 失败: {e}")
-            print(f"    成功上传 {archive_name} 的解压内容")
+            root_prefix = root + os.sep
+            for file_name in files:
+                if rel_prefix + file_name not in done_files:
+                    upload_tasks.append((upload_seafile_dir, root_prefix + file_name))
+
+        if job.resuming and seafile_dirs:
+            existing_dirs = find_existing_dirs(repo, seafile_dirs, upload_executor)
+            if existing_dirs:
+                record_dirs(existing_dirs)
+                seafile_dirs = [dir_path for dir_path in seafile_dirs if dir_path not in existing_dirs]
+
+        # 先按深度逐层并发创建全部目录，再按目录合并成批并发上传文件
+        dirs_ok = create_dirs(repo, seafile_dirs, upload_executor,
+                              on_created=lambda dir_path: record_dirs([dir_path]))
+        # 每批上传完成后立即在工作线程中记录进度；这里按提交顺序用 result() 等待全部完成
+        futures = [upload_executor.submit(upload_and_record, upload_seafile_dir, file_paths)
+                   for upload_seafile_dir, file_paths in batch_upload_tasks(upload_tasks)]
+        uploads_ok = all([future.result() for future in futures])
+
+        if not (dirs_ok and uploads_ok):
+            log(f"    {archive_name} 的部分解压内容上传失败，下次运行时将继续上传")
+            return False
+
+        # 全部上传成功后写入完成标记，之后的运行据此跳过该压缩文件
+        marker_local_path = os.path.join(job.job_dir, get_done_marker_name(archive_name))
+        open(marker_local_path, 'wb').close()
+        repo.upload_file(target_seafile_dir, marker_local_path)
+        if upload_state is not None:
+            upload_state.discard(state_key)
+        log(f"    成功上传 {archive_name} 的解压内容")
+        return True
+    except Exception as e:
+        log(f"    上传解压内容失败: {e}")
+        return False
+
+def cleanup_archive_job(job):
+    """删除任务的临时子目录。"""
+    if job.job_dir is not None:
+        shutil.rmtree(job.job_dir, ignore_errors=True)
+        job.job_dir = None
+
+# 通知流水线工作线程退出的哨兵
+_STOP = object()
+
+# 流水线线程等待队列时检查停止标志的间隔（秒）
+_QUEUE_POLL_INTERVAL = 0.5
+
+def _pipeline_worker(stage, in_queue, out_queue, stop_event):
+    """
+    流水线工作线程：从 in_queue 取任务执行 stage，成功则交给下一阶段，
+    失败或已是最后一个阶段时清理任务的临时目录。收到 _STOP 时退出。
+
+    stop_event 被设置（如用户按下 Ctrl-C）后不再开始新任务：当前任务的阶段
+    执行完后清理该任务并退出，队列中的任务由主线程丢弃。
+    """
+    while not stop_event.is_set():
+        try:
+            job = in_queue.get(timeout=_QUEUE_POLL_INTERVAL)
+        except Empty:
+            continue
+        if job is _STOP:
+            return
+        try:
+            ok = stage(job)
         except Exception as e:
-            print(f"    上传解压内容失败: {e}")
-    else:
-        print(f"    解压 {archive_name} 失败")
+            log(f"  处理 {job.archive_full_path} 时发生未预期的错误: {e}")
+            ok = False
+        if not (ok and out_queue is not None and _put_unless_stopped(out_queue, job, stop_event)):
+            cleanup_archive_job(job)
+
+def _put_unless_stopped(queue, job, stop_event):
+    """把任务放入有界队列，队列满时等待；停止后放弃并返回 False。"""
+    while not stop_event.is_set():
+        try:
+            queue.put(job, timeout=_QUEUE_POLL_INTERVAL)
+            return True
+        except Full:
+            continue
+    return False
 
-def process_path_recursively(seafile_api, repo_id, path, temp_dir):
+def _discard_queued_jobs(queue):
+    """清空队列，并清理其中尚未处理的任务。"""
+    while True:
+        try:
+            job = queue.get_nowait()
+        except Empty:
+            return
+        if job is not _STOP:
+            cleanup_archive_job(job)
+
+def process_path_recursively(seafile_api, repo_id, path, temp_dir, concurrency=DEFAULT_CONCURRENCY,
+                             upload_state=None):
     """
     递归处理指定路径及其所有子目录中的压缩文件。
+
+    目录遍历在当前线程中串行进行，发现的压缩文件进入由下载、解压、上传
+    三个阶段组成的流水线。各阶段有各自的工作线程并通过有界队列衔接，
+    因此不同压缩文件的下载、解压与上传可以同时进行。分段下载和上传请求
+    分别由整个流水线共用的线程池执行，同时发往服务器的请求数由 concurrency 决定。
     """
-    repo = seafile_api.get_repo(repo_id)
-    repo_details = repo.get_repo_details()
-    print(f"\n开始递归处理仓库: {repo_details['repo_name']}，路径: {path}")
+    repo = get_repo(seafile_api, repo_id)
+    repo_details = get_repo_details(repo)
+    log(f"\n开始递归处理仓库: {repo_details['repo_name']}，路径: {path}")
 
-    queue = [path]
-    processed_paths = set()
+    # 解压在子进程中进行；使用 spawn 避免在已有多个线程时 fork 进程
+    extract_workers = os.cpu_count() or 1
+    extract_pool = ProcessPoolExecutor(max_workers=extract_workers,
+                                       mp_context=multiprocessing.get_context('spawn'))
 
-    while queue:
-        current_path = queue.pop(0)
+    set_http_pool_size(_session, http_pool_size(concurrency))
+    range_executor = ThreadPoolExecutor(max_workers=concurrency)
+    upload_executor = ThreadPoolExecutor(max_workers=concurrency * UPLOAD_WORKERS_PER_ARCHIVE)
 
-        if current_path in processed_paths:
-            continue
-        processed_paths.add(current_path)
+    download_queue = Queue(maxsize=concurrency * 2)
+    extract_queue = Queue(maxsize=concurrency)
+    upload_queue = Queue(maxsize=concurrency)
+    stages = [
+        (functools.partial(fetch_archive, range_executor=range_executor),
+         download_queue, extract_queue, concurrency),
+        (functools.partial(extract_downloaded_archive, extract_pool=extract_pool),
+         extract_queue, upload_queue, extract_workers),
+        (functools.partial(upload_extracted_contents, upload_executor=upload_executor),
+         upload_queue, None, concurrency),
+    ]
 
-        try:
-            items = repo.list_dir(current_path)
-        except Exception as e:
-            print(f"  无法列出目录 {current_path}，跳过。错误: {e}")
-            continue
-        
-        archives_in_dir = []
-        dirs_in_dir = []
-        for item in items:
-            if item['type'] == 'file' and is_archive_file(item['name']):
-                archives_in_dir.append(item)
-            elif item['type'] == 'dir':
-                dirs_in_dir.append(item)
-
-        if not archives_in_dir:
-            print(f"  在目录 {current_path} 中未找到压缩文件。")
-        else:
-            print(f"  在目录 {current_path} 中找到 {len(archives_in_dir)} 个压缩文件。")
-            for archive_item in archives_in_dir:
-                handle_archive_file(repo, current_path, archive_item, temp_dir)
-
-        for dir_item in dirs_in_dir:
-            dir_full_path = os.path.join(current_path, dir_item['name']).replace('\\', '/')
-            queue.append(dir_full_path)
+    # 工作线程设为守护线程：再次按下 Ctrl-C 时解释器可以直接退出，不必等待它们
+    stop_event = threading.Event()
+    running_stages = []
+    for stage, in_queue, out_queue, workers in stages:
+        threads = [threading.Thread(target=_pipeline_worker, args=(stage, in_queue, out_queue, stop_event),
+                                    daemon=True)
+                   for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        running_stages.append((threads, in_queue))
+
+    # Seafile 的目录结构是一棵树，不会重复访问同一路径，无需记录已访问集合
+    queue = deque([path])
+
+    try:
+        while queue:
+            current_path = queue.popleft()
 
+            try:
+                items = repo.list_dir(current_path)
+            except Exception as e:
+                log(f"  无法列出目录 {current_path}，跳过。错误: {e}")
+                continue
+
+            existing_names = {item['name'] for item in items}
+            archives_in_dir = []
+            dirs_in_dir = []
+            for item in items:
+                if item['type'] == 'file' and is_archive_file(item['name']):
+                    archives_in_dir.append(item)
+                elif item['type'] == 'dir':
+                    dirs_in_dir.append(item)
+
+            if not archives_in_dir:
+                log(f"  在目录 {current_path} 中未找到压缩文件。")
+            else:
+                log(f"  在目录 {current_path} 中找到 {len(archives_in_dir)} 个压缩文件。")
+                for archive_item in archives_in_dir:
+                    download_queue.put(ArchiveJob(repo, current_path, archive_item, temp_dir,
+                                                  existing_names, upload_state))
+
+            for dir_item in dirs_in_dir:
+                dir_full_path = os.path.join(current_path, dir_item['name']).replace('\\', '/')
+                queue.append(dir_full_path)
+    except BaseException:
+        # 中断或出错：通知各阶段停止，取消尚未开始的请求，丢弃排队中的任务
+        log("\n正在停止，等待进行中的任务结束（再次按下 Ctrl-C 立即退出）...")
+        stop_event.set()
+        range_executor.shutdown(wait=False, cancel_futures=True)
+        upload_executor.shutdown(wait=False, cancel_futures=True)
+        extract_pool.shutdown(wait=False, cancel_futures=True)
+        for threads, in_queue in running_stages:
+            _discard_queued_jobs(in_queue)
+        raise
+    finally:
+        # 正常结束时按阶段顺序关闭：上一阶段全部退出后，下一阶段才不会再收到新任务；
+        # 停止时各线程完成当前任务后自行退出
+        for threads, in_queue in running_stages:
+            if not stop_event.is_set():
+                for _ in threads:
+                    in_queue.put(_STOP)
+            for thread in threads:
+                thread.join()
+        if stop_event.is_set():
+            # 停止前刚交给下一阶段、未被取走的任务
+            for threads, in_queue in running_stages:
+                _discard_queued_jobs(in_queue)
+        extract_pool.shutdown()
+        range_executor.shutdown()
+        upload_executor.shutdown()
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(description="解压 Seafile 中的所有压缩文件并上传解压内容。")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"同时处理的压缩文件数量 (默认: {DEFAULT_CONCURRENCY})")
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency 必须大于等于 1")
+    return args
 
 def main():
     """Main function to handle user input and process the specified path."""
+    args = parse_args()
+
     try:
         seafile_api = SeafileAPI(LOGIN_NAME, PASSWORD, SERVER_URL)
         seafile_api.auth()
+        configure_session(seafile_api)
         print("已成功验证 Seafile 账户。")
     except Exception as e:
         print(f"账户验证失败: {e}")
@@ -303,7 +1294,11 @@ def main():
     # 使用临时目录来处理文件
     with tempfile.TemporaryDirectory() as temp_dir:
         print(f"\n正在使用临时目录: {temp_dir}")
-        process_path_recursively(seafile_api, repo_id, path, temp_dir)
+        upload_state = UploadState(STATE_FILE)
+        try:
+            process_path_recursively(seafile_api, repo_id, path, temp_dir, args.concurrency, upload_state)
+        finally:
+            upload_state.close()
 
 if __name__ == "__main__":
     main()